@@ -0,0 +1,112 @@
+"""
+Write throughput of sharded product storage against shard count.
+
+Runs one writer process per seller, each inserting products through
+ShardRouter.add_product (one BEGIN IMMEDIATE transaction per row), into
+throwaway sqlite files. Every shard count is run several times and the median
+is reported, together with how long writers waited on each shard's write lock
+(time spent in BEGIN IMMEDIATE) per row.
+
+Run from the repo root:  python bench/bench_sharding.py [rows_per_seller] [repeats]
+"""
+
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text
+from product import models
+from product.sharding import ShardRouter
+
+SHARD_COUNTS = [1, 2, 4, 8]
+SELLERS = 8
+ROWS_PER_SELLER = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+start_barrier = None
+
+
+def init_worker(barrier):
+    global start_barrier
+    start_barrier = barrier
+
+
+def track_lock_wait(engine, waits, shard):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement == 'BEGIN IMMEDIATE':
+            conn.info['lock_requested'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if statement == 'BEGIN IMMEDIATE':
+            waits[shard] += time.perf_counter() - conn.info.pop('lock_requested')
+
+
+def insert_rows(args):
+    count, url, seller_id = args
+    router = ShardRouter(count, url=url)
+    waits = [0.0] * count
+    for shard, engine in enumerate(router.engines):
+        track_lock_wait(engine, waits, shard)
+    start_barrier.wait()
+    start = time.perf_counter()
+    for n in range(ROWS_PER_SELLER):
+        router.add_product(models.Product(
+            name=f'product {n}',
+            description='benchmark row',
+            price=n,
+            seller_id=seller_id
+        ))
+    elapsed = time.perf_counter() - start
+    for engine in router.engines:
+        engine.dispose()
+    return elapsed, waits
+
+
+def run(count):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f'sqlite:///{directory}/product_shard_{{}}.db'
+        router = ShardRouter(count, url=url)
+        router.create_all()
+        barrier = multiprocessing.Barrier(SELLERS)
+        with multiprocessing.Pool(SELLERS, initializer=init_worker, initargs=(barrier,)) as pool:
+            results = pool.map(insert_rows, [(count, url, seller_id) for seller_id in range(1, SELLERS + 1)])
+        rows = 0
+        for engine in router.engines:
+            with engine.connect() as conn:
+                rows += conn.execute(text('SELECT count(*) FROM products')).scalar()
+            engine.dispose()
+    assert rows == SELLERS * ROWS_PER_SELLER
+    # writers start together, so the slowest one bounds the run
+    elapsed = max(e for e, _ in results)
+    rows_per_shard = [
+        ROWS_PER_SELLER * sum(1 for s in range(1, SELLERS + 1) if router.shard_for_seller(s) == shard)
+        for shard in range(count)
+    ]
+    wait_ms_per_row = [
+        1000 * sum(waits[shard] for _, waits in results) / rows_per_shard[shard]
+        for shard in range(count)
+    ]
+    return rows / elapsed, wait_ms_per_row
+
+
+if __name__ == '__main__':
+    print(f'{SELLERS} seller processes x {ROWS_PER_SELLER} rows, one commit per row, '
+          f'median of {REPEATS} runs')
+    if (os.cpu_count() or 1) < SELLERS:
+        print(f'note: only {os.cpu_count()} CPUs for {SELLERS} writers; throughput will be '
+              'CPU-bound and lock wait is the column to read')
+    baseline = None
+    for count in SHARD_COUNTS:
+        runs = [run(count) for _ in range(REPEATS)]
+        rate = statistics.median(r for r, _ in runs)
+        waits = [statistics.median(w[shard] for _, w in runs) for shard in range(count)]
+        baseline = baseline or rate
+        print(f'shards={count:<2} {rate:8.0f} rows/sec ({rate / baseline:.2f}x)  '
+              f'lock wait ms/row by shard: {", ".join(f"{w:.1f}" for w in waits)}')
@@ -0,0 +1,159 @@
+"""
+Load test for request coalescing on the product read routes.
+
+Fires concurrent identical requests at the app in-process (needs httpx)
+against throwaway sqlite files, and checks how many loads and product SELECTs
+they actually cost:
+
+- GET /product/{id} and GET /product/ share one execution per burst
+- concurrent reads of a missing id share one execution and its 404
+- a write during an in-flight load makes the next read start a fresh one
+
+Queries are slowed down with an engine hook to widen the in-flight window.
+Honours PRODUCT_SHARDS like the app does.
+
+Run from the repo root:  python bench/loadtest_singleflight.py [requests]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+QUERY_DELAY = 0.05
+
+product_selects = 0
+hold_next_select = False
+held = threading.Event()
+release = threading.Event()
+
+
+def on_execute(conn, cursor, statement, parameters, context, executemany):
+    global product_selects, hold_next_select
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return
+    if 'FROM products' in statement:
+        product_selects += 1
+    if hold_next_select:
+        hold_next_select = False
+        held.set()
+        release.wait()
+    else:
+        time.sleep(QUERY_DELAY)
+
+
+def reset():
+    global product_selects
+    product_selects = 0
+    product_reads.reset_metrics()
+
+
+async def burst(client, url, headers=None):
+    return await asyncio.gather(*[client.get(url, headers=headers) for _ in range(REQUESTS)])
+
+
+def report(name):
+    metrics = dict(product_reads.metrics)
+    print(f'{name:<22} {metrics}  product SELECTs: {product_selects}')
+    return metrics
+
+
+async def coalesced_get(client):
+    reset()
+    responses = await burst(client, '/product/1')
+    assert all(r.status_code == 200 for r in responses)
+    metrics = report('GET /product/1')
+    assert metrics['calls'] == REQUESTS
+    assert metrics['executions'] < metrics['calls']
+    assert product_selects == metrics['executions']
+
+
+async def coalesced_listing(client, headers):
+    reset()
+    responses = await burst(client, '/product/', headers)
+    assert all(r.status_code == 200 and len(r.json()) == 1 for r in responses)
+    metrics = report('GET /product/')
+    assert metrics['executions'] < metrics['calls']
+    # PRODUCT_SHARDS=N scatters each listing load to N shards
+    assert product_selects == metrics['executions'] * (shard_router.count if shard_router else 1)
+
+
+async def shared_not_found(client):
+    reset()
+    responses = await burst(client, '/product/999999')
+    assert all(r.status_code == 404 for r in responses)
+    metrics = report('GET /product/999999')
+    assert metrics['executions'] == 1
+    assert metrics['coalesced'] == REQUESTS - 1
+
+
+async def write_during_load(client):
+    global hold_next_select
+    reset()
+    hold_next_select = True
+    held.clear()
+    release.clear()
+    stale = asyncio.ensure_future(client.get('/product/1'))
+    await asyncio.to_thread(held.wait)
+    # the first load is parked mid-query; the write commits and forgets it
+    update = await client.put('/product/1', json={'name': 'updated', 'description': 'popular', 'price': 2})
+    assert update.status_code == 201
+    fresh = asyncio.ensure_future(client.get('/product/1'))
+    # if the write failed to forget the parked load, the fresh read joins it
+    # and can't finish until it is released
+    await asyncio.wait({fresh}, timeout=1)
+    release.set()
+    await stale
+    fresh = await fresh
+    metrics = report('write during load')
+    assert metrics['executions'] == 2 and metrics['coalesced'] == 0
+    assert fresh.json()['name'] == 'updated'
+
+
+async def main():
+    with SessionLocal() as db:
+        db.add(models.Seller(username='bench', email='bench@example.com', password='x'))
+        db.commit()
+    headers = {'Authorization': 'Bearer ' + generate_token({'sub': 'bench'})}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        created = await client.post('/product/', json={'name': 'hot', 'description': 'popular', 'price': 1}, headers=headers)
+        assert created.status_code == 201
+        print(f'{REQUESTS} concurrent requests per burst')
+        await coalesced_get(client)
+        await coalesced_listing(client, headers)
+        await shared_not_found(client)
+        await write_during_load(client)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        # product.db and the shard files are relative paths, so keep them out
+        # of the repo
+        cwd = os.getcwd()
+        os.chdir(directory)
+        engines = []
+        try:
+            import httpx
+            from sqlalchemy import event
+            from product import models
+            from product.database import engine, SessionLocal
+            from product.main import app
+            from product.routers.login import generate_token
+            from product.sharding import shard_router
+            from product.singleflight import product_reads
+
+            engines = [engine] + (shard_router.engines if shard_router else [])
+            for e in engines:
+                event.listen(e, 'before_cursor_execute', on_execute)
+            asyncio.run(main())
+        finally:
+            for e in engines:
+                e.dispose()
+            os.chdir(cwd)
@@ -1,9 +1,13 @@
 from fastapi import FastAPI
 from .import models
 from .database import engine
+from .sharding import shard_router
 from .routers import product, seller, login
 from .import schemas
 models.Base.metadata.create_all(engine)
+if shard_router:
+    shard_router.create_all()
+    shard_router.check_layout(engine)
 # from .routersv2 import product as p2
 
 app = FastAPI(
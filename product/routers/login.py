@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, status, HTTPException
 from ..import schemas, models
-from ..database import get_db
+from ..database import get_db, SessionLocal
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
@@ -55,4 +55,11 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
         token_data = schemas.TokenData(username=username)
     except JWTError:
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
+    # short-lived session: a request-scoped one would keep its pooled
+    # connection checked out while the endpoint waits on shared reads
+    with SessionLocal() as db:
+        seller = db.query(models.Seller).filter(models.Seller.username==token_data.username).first()
+    if seller is None:
+        raise credentials_exception
+    return seller
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, status
 from sqlalchemy.orm import Session
 from fastapi.params import Depends
-from ..database import get_db
+from ..database import get_db, SessionLocal
 from ..import models, schemas
+from ..singleflight import product_reads
+from ..sharding import shard_router, get_product_db
 from typing import List
 from product.routers.login import get_current_user
 
@@ -13,10 +15,74 @@ router = APIRouter(
 )
 
 
+def _display(products, db):
+    # sellers are looked up in product.db rather than through product.seller,
+    # since sharded products don't live next to the sellers table
+    seller_ids = {p.seller_id for p in products}
+    sellers = {s.id: s for s in db.query(models.Seller).filter(models.Seller.id.in_(seller_ids))}
+    return [
+        schemas.DisplayProduct.model_validate(
+            {'name': p.name, 'description': p.description, 'seller': sellers.get(p.seller_id)},
+            from_attributes=True
+        ).model_dump()
+        for p in products
+    ]
+
+
+def _load_products():
+    # runs once per coalesced group, so it owns its session and returns plain
+    # dicts that every waiting request can share
+    with SessionLocal() as db:
+        if shard_router:
+            products = shard_router.all_products()
+        else:
+            products = db.query(models.Product).all()
+        return _display(products, db)
+
+
+def _load_product(id: int):
+    with SessionLocal() as db:
+        if shard_router:
+            product = shard_router.get_product(id)
+        else:
+            product = db.query(models.Product).filter(models.Product.id == id).first()
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Product not found'
+            )
+        return _display([product], db)[0]
+
+
+def _load_seller_products(seller_id: int):
+    with SessionLocal() as db:
+        if shard_router:
+            products = shard_router.products_for_seller(seller_id)
+        else:
+            products = db.query(models.Product).filter(models.Product.seller_id == seller_id).all()
+        return _display(products, db)
+
+
+def _forget_reads(seller_id, id=None):
+    if id is not None:
+        product_reads.forget(('product', id))
+    product_reads.forget(('seller', seller_id))
+    product_reads.forget('products')
+
+
 @router.get('/', response_model=List[schemas.DisplayProduct])
-def products(db: Session = Depends(get_db), current_user:schemas.Seller=Depends(get_current_user)):
-    products = db.query(models.Product).all()
-    return products
+async def products(current_user:schemas.Seller=Depends(get_current_user)):
+    return await product_reads.do('products', _load_products)
+
+
+@router.get('/seller/{seller_id}', response_model=List[schemas.DisplayProduct])
+async def seller_products(seller_id: int):
+    return await product_reads.do(('seller', seller_id), _load_seller_products, seller_id)
+
+
+@router.get('/metrics/coalescing')
+def coalescing_metrics(current_user:schemas.Seller=Depends(get_current_user)):
+    return dict(product_reads.metrics)
 
 
 # @router.get('/product/{id}', response_model=schemas.DisplayProduct)
@@ -26,46 +92,52 @@ def products(db: Session = Depends(get_db), current_user:schemas.Seller=Depends(
 
 
 @router.get('/{id}', response_model=schemas.DisplayProduct)
-def product(id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == id).first()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Product not found'
-        )
-    return product
+async def product(id: int):
+    return await product_reads.do(('product', id), _load_product, id)
 
 
 @router.delete('/{id}')
-def delete(id, db: Session = Depends(get_db)):
-    db.query(models.Product).filter(models.Product.id==id).delete(synchronize_session=False)
+def delete(id: int, db: Session = Depends(get_product_db)):
+    product = db.query(models.Product).filter(models.Product.id==id)
+    existing = product.first()
+    seller_id = existing.seller_id if existing else None
+    product.delete(synchronize_session=False)
     db.commit()
+    if existing:
+        _forget_reads(seller_id, id)
     return {f'Deleted: Product with id :- {id}'}
 
 
 @router.put('/{id}', status_code=status.HTTP_201_CREATED)
-def update(id, request: schemas.Product, db: Session = Depends(get_db) ):
+def update(id: int, request: schemas.Product, db: Session = Depends(get_product_db) ):
     product = db.query(models.Product).filter(models.Product.id==id)
-    if not product.first():
+    existing = product.first()
+    if not existing:
         return {"Not Found"}
     else:
+        seller_id = existing.seller_id
         product.update(request.model_dump())
         db.commit()
+        _forget_reads(seller_id, id)
         return {'Updated product !'}
 
 
 @router.post('/',status_code=status.HTTP_201_CREATED, response_model=schemas.DisplayProduct)
-def add(request: schemas.Product, db: Session = Depends(get_db)):
+def add(request: schemas.Product, db: Session = Depends(get_db), current_user:schemas.Seller=Depends(get_current_user)):
     new_product = models.Product(
         name=request.name, 
         description=request.description, 
         price=request.price,
-        seller_id = 1
+        seller_id = current_user.id
     )
-    db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
-    return new_product
+    if shard_router:
+        shard_router.add_product(new_product)
+    else:
+        db.add(new_product)
+        db.commit()
+        db.refresh(new_product)
+    _forget_reads(new_product.seller_id)
+    return _display([new_product], db)[0]
 
 
 
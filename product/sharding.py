@@ -0,0 +1,122 @@
+"""
+Optional sharded storage for products.
+
+Set PRODUCT_SHARDS=N (N > 1) to spread Product rows over N sqlite files by
+seller_id, so each seller's writes only take their own shard's write lock.
+Sellers stay in product.db. Product ids are allocated so that
+id % N == shard, which lets single-product lookups go straight to one shard.
+
+N is fixed once any shard holds data: both routing rules depend on it, and
+rows already in product.db are not read in sharded mode. check_layout()
+refuses to start in either situation; there is no migration step, so moving
+between layouts means exporting and re-inserting the products.
+"""
+
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import sessionmaker
+from . import models
+from .database import SessionLocal
+
+SHARD_DATABASE_URL = 'sqlite:///./product_shard_{}.db'
+PRODUCT_SHARDS = int(os.getenv('PRODUCT_SHARDS', '1'))
+
+
+class ShardRouter:
+    def __init__(self, count, url=SHARD_DATABASE_URL):
+        self.count = count
+        self.engines = [
+            create_engine(url.format(n), connect_args={"check_same_thread": False})
+            for n in range(count)
+        ]
+        self.sessions = [
+            sessionmaker(bind=e, autocommit=False, autoflush=False)
+            for e in self.engines
+        ]
+        self._pool = ThreadPoolExecutor(max_workers=count)
+
+    def create_all(self):
+        for engine in self.engines:
+            models.Product.__table__.create(bind=engine, checkfirst=True)
+
+    def check_layout(self, main_engine):
+        with main_engine.connect() as conn:
+            if conn.execute(text('SELECT 1 FROM products LIMIT 1')).first():
+                raise RuntimeError(
+                    'product.db already holds products; they would be invisible '
+                    'with PRODUCT_SHARDS set'
+                )
+        for shard, engine in enumerate(self.engines):
+            with engine.connect() as conn:
+                misplaced = conn.execute(
+                    text('SELECT 1 FROM products WHERE id % :n != :shard '
+                         'OR seller_id % :n != :shard LIMIT 1'),
+                    {'n': self.count, 'shard': shard}
+                ).first()
+            if misplaced:
+                raise RuntimeError(
+                    f'shard {shard} has rows that do not belong to it '
+                    f'with PRODUCT_SHARDS={self.count}; the shard count cannot '
+                    'change once data exists'
+                )
+
+    def shard_for_seller(self, seller_id):
+        return seller_id % self.count
+
+    def shard_for_product(self, product_id):
+        return product_id % self.count
+
+    def session_for_seller(self, seller_id):
+        return self.sessions[self.shard_for_seller(seller_id)]()
+
+    def session_for_product(self, product_id):
+        return self.sessions[self.shard_for_product(product_id)]()
+
+    def add_product(self, product):
+        shard = self.shard_for_seller(product.seller_id)
+        with self.sessions[shard]() as db:
+            # take the shard's write lock before reading max(id), so the id
+            # stays unique across threads and worker processes
+            db.execute(text('BEGIN IMMEDIATE'))
+            last = db.query(func.max(models.Product.id)).scalar() or 0
+            product_id = last + 1
+            product.id = product_id + (shard - product_id) % self.count
+            db.add(product)
+            db.commit()
+            db.refresh(product)
+        return product
+
+    def get_product(self, product_id):
+        with self.session_for_product(product_id) as db:
+            return db.query(models.Product).filter(models.Product.id == product_id).first()
+
+    def products_for_seller(self, seller_id):
+        # all of a seller's products live on one shard
+        with self.session_for_seller(seller_id) as db:
+            return db.query(models.Product).filter(models.Product.seller_id == seller_id).all()
+
+    def all_products(self):
+        # scatter the query to every shard in parallel, then merge the
+        # per-shard id-ordered results into one id-ordered list
+        def load(Session):
+            with Session() as db:
+                return db.query(models.Product).order_by(models.Product.id).all()
+
+        results = list(self._pool.map(load, self.sessions))
+        return list(heapq.merge(*results, key=lambda p: p.id))
+
+
+shard_router = ShardRouter(PRODUCT_SHARDS) if PRODUCT_SHARDS > 1 else None
+
+
+def get_product_db(id: int):
+    if shard_router is None:
+        db = SessionLocal()
+    else:
+        db = shard_router.session_for_product(id)
+    try:
+        yield db
+    finally:
+        db.close()
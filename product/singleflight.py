@@ -0,0 +1,52 @@
+"""
+Request coalescing (single-flight) for identical concurrent reads.
+
+While a call for a given key is in flight, every other caller asking for the
+same key awaits that call instead of starting its own, so N concurrent
+identical requests cost one DB query.
+
+The tradeoff is staleness: a caller that joins a load which started before a
+write committed gets the pre-write result (including a shared 404). Writers
+call forget() after committing so the next read starts a fresh query.
+"""
+
+import asyncio
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}  # key -> asyncio.Task
+        self.metrics = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key, fn, *args, **kwargs):
+        self.metrics["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.metrics["executions"] += 1
+            # the blocking work runs in its own task so a caller that
+            # disconnects doesn't cancel it for everyone else waiting on it
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.metrics["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def forget(self, key):
+        # the dropped task still finishes for its current waiters; its done
+        # callback won't remove a newer task registered under the same key
+        self._inflight.pop(key, None)
+
+    def _forget(self, key, task):
+        # forget() may pop the key from a worker thread at any point, so
+        # never assume it is still there
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+
+    def reset_metrics(self):
+        for name in self.metrics:
+            self.metrics[name] = 0
+
+
+product_reads = SingleFlight()